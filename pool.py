@@ -0,0 +1,38 @@
+# Shared MariaDB connection pool (Wikimedia-style: reuse connections, avoid
+# per-script TCP+auth handshakes). All tools acquire from POOL instead of
+# calling pymysql.connect() directly.
+
+import pymysql
+from dbutils.pooled_db import PooledDB
+
+from config import DB_CONFIG
+
+
+class DBPool:
+    """Lazy wrapper around dbutils' PooledDB.
+
+    The underlying pool is created on first use (not at import) so test
+    suites and offline runs don't trigger mincached connection attempts.
+    """
+
+    def __init__(self, mincached=2, maxcached=10, maxconnections=25):
+        self._pool = None
+        self._mincached = mincached
+        self._maxcached = maxcached
+        self._maxconnections = maxconnections
+
+    def connection(self):
+        """Acquire a pooled connection (blocks if pool is exhausted)."""
+        if self._pool is None:
+            self._pool = PooledDB(
+                creator=pymysql,
+                mincached=self._mincached,
+                maxcached=self._maxcached,
+                maxconnections=self._maxconnections,
+                blocking=True,
+                **DB_CONFIG,
+            )
+        return self._pool.connection()
+
+
+POOL = DBPool()
@@ -5,30 +5,70 @@ Monitors lag, prints simple topology graph, and simulates alerting.
 Handles multi-site topologies (e.g., primary -> replicas across shards).
 """
 
-import pymysql
+import collections
+import threading
+import time
+
 from config import DB_CONFIG, LAG_THRESHOLD_SEC
+from pool import POOL
 
 def connect_db():
-    """Connect to MariaDB (primary or replica)."""
-    return pymysql.connect(**DB_CONFIG)
+    """Acquire a pooled MariaDB connection (primary or replica)."""
+    return POOL.connection()
+
+# pt-heartbeat-style lag table: a cron on the primary touches the row every
+# second (`UPDATE heartbeat SET ts = NOW(6) WHERE id = 1`); replicas read it.
+HEARTBEAT_DDL = "CREATE TABLE IF NOT EXISTS heartbeat (id INT PRIMARY KEY, ts DATETIME(6))"
+
+def beat(db):
+    """Refresh the heartbeat row (run on the primary, e.g. via cron)."""
+    with db.cursor() as cursor:
+        cursor.execute("UPDATE heartbeat SET ts = NOW(6) WHERE id = 1;")
+    db.commit()
 
 def get_replication_lag(db):
-    """Fetch replication lag in seconds (SHOW SLAVE STATUS)."""
+    """Fetch replication lag in seconds from the replicated heartbeat row.
+
+    A single indexed row read, vs SHOW SLAVE STATUS which snapshots ~60
+    columns under an internal server mutex — and gives sub-second resolution.
+    """
     with db.cursor() as cursor:
-        cursor.execute("SHOW SLAVE STATUS;")
+        cursor.execute(
+            "SELECT TIMESTAMPDIFF(MICROSECOND, ts, NOW(6)) / 1e6 "
+            "FROM heartbeat WHERE id = 1;"
+        )
         result = cursor.fetchone()
-        if result:
-            lag = int(result[32]) if result[32] else 0  # Seconds_Behind_Master
-            return lag
-        return 0
+        if result and result[0] is not None:
+            return float(result[0])
+        return 0.0
+
+# Topology changes minutes-to-hours apart, but SHOW SLAVE HOSTS takes an
+# internal mutex on the primary — don't re-issue it every monitoring tick.
+TOPOLOGY_TTL_SEC = 60
+_topology_cache = {}  # host -> (epoch, topology)
 
 def get_topology(db):
-    """Simple topology: primary/replicas (extend for full Orchestrator-like graph)."""
+    """Simple topology: primary/replicas (extend for full Orchestrator-like graph).
+
+    Cached per primary for TOPOLOGY_TTL_SEC; call refresh_topology() to
+    force a re-read (e.g., after a planned switchover).
+    """
+    host = DB_CONFIG['host']
+    epoch = int(time.time() // TOPOLOGY_TTL_SEC)
+    cached = _topology_cache.get(host)
+    if cached and cached[0] == epoch:
+        return cached[1]
     with db.cursor() as cursor:
         # Assume a 'topology' table or query SHOW SLAVE HOSTS
         cursor.execute("SHOW SLAVE HOSTS;")
         hosts = [row[0] for row in cursor.fetchall()]
-        return {'primary': DB_CONFIG['host'], 'replicas': hosts}
+    topology = {'primary': host, 'replicas': hosts}
+    _topology_cache[host] = (epoch, topology)
+    return topology
+
+def refresh_topology():
+    """Drop the cached topology so the next get_topology() re-reads it."""
+    _topology_cache.clear()
 
 def print_topology_graph(topology):
     """Text-based graph (e.g., for ASCII viz; extend to Graphviz)."""
@@ -37,13 +77,41 @@ def print_topology_graph(topology):
     for replica in topology['replicas']:
         print(f"  └─ Replica: {replica}")
 
+# Ring buffer between the sampling loop and stdout: the monitor can poll at
+# Hz rates without paying the print syscall (GIL + stdout lock) per tick.
+_events = collections.deque(maxlen=1024)
+_flush_wakeup = threading.Event()
+_MSGS = (
+    "✅ Lag OK: {}s",
+    f"🚨 ALERT: Replication lag {{}}s exceeds {LAG_THRESHOLD_SEC}s threshold!",
+)
+
 def alert_on_lag(lag):
-    """Simulate alerting (e.g., email/Slack for Wikimedia on-call)."""
-    if lag > LAG_THRESHOLD_SEC:
-        print(f"🚨 ALERT: Replication lag {lag}s exceeds {LAG_THRESHOLD_SEC}s threshold!")
-        # TODO: Integrate with PagerDuty or Wikimedia's alerting
-    else:
-        print(f"✅ Lag OK: {lag}s")
+    """Simulate alerting (e.g., email/Slack for Wikimedia on-call).
+
+    Classifies via a branchless tuple index and appends to the ring buffer;
+    printing happens in flush_events() off the sampling loop.
+    """
+    _events.append(_MSGS[lag > LAG_THRESHOLD_SEC].format(lag))
+    # TODO: Integrate with PagerDuty or Wikimedia's alerting
+    _flush_wakeup.set()
+
+def flush_events():
+    """Drain queued messages to stdout."""
+    while _events:
+        print(_events.popleft())
+
+def _flush_loop():
+    while True:
+        _flush_wakeup.wait()
+        _flush_wakeup.clear()
+        flush_events()
+
+def start_flusher():
+    """Start the daemon flusher thread (for long-running monitor loops)."""
+    thread = threading.Thread(target=_flush_loop, daemon=True)
+    thread.start()
+    return thread
 
 def main():
     db = connect_db()
@@ -53,6 +121,7 @@ def main():
         topology = get_topology(db)
         print_topology_graph(topology)
     finally:
+        flush_events()  # One-shot run: drain synchronously instead of threading
         db.close()
 
 if __name__ == "__main__":
@@ -1,17 +1,22 @@
 # Simple pytest for replication monitor
+import pymysql
 import pytest
 from scripts.replication_monitor import get_replication_lag, alert_on_lag
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, patch
+
+# Heartbeat row read: TIMESTAMPDIFF(...) / 1e6 = 3s lag (shared, immutable)
+_LAG_3S_ROW = (3.0,)
 
 @pytest.fixture
 def mock_db():
-    db = Mock()
-    db.cursor.return_value.fetchone.return_value = (None,) * 32 + (3,)  # Mock lag=3s
+    # spec'd against the real Connection so attribute typos fail loudly
+    db = MagicMock(spec=pymysql.connections.Connection)
+    db.cursor.return_value.__enter__.return_value.fetchone.return_value = _LAG_3S_ROW
     return db
 
 def test_lag_below_threshold(mock_db):
-    with patch('pymysql.connect') as mock_connect:
-        mock_connect.return_value = mock_db
+    with patch('pool.POOL.connection') as mock_connection:
+        mock_connection.return_value = mock_db
         lag = get_replication_lag(mock_db)
         assert lag == 3
         alert_on_lag(lag)  # No alert expected